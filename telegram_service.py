@@ -1,13 +1,27 @@
 # telegram_service.py
-import os, json, asyncio
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict
-from fastapi import FastAPI, Query
+import os, sys, json, asyncio, time, heapq, dataclasses, functools, itertools
+from array import array
+from bisect import bisect_left
+import aiofiles
+import zstandard
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Dict, Set, Tuple
+from fastapi import FastAPI, Query, Response
 from pydantic import BaseModel
 from telethon import TelegramClient
-from telethon.errors import FloodWaitError
+from telethon.errors import FloodWaitError, ChannelPrivateError, UsernameNotOccupiedError
 from telethon.sessions import StringSession
 
+try:
+    import orjson
+except ImportError:  # orjson 미설치 시 표준 json으로 대체
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:  # Windows 등 uvloop 미지원 환경은 기본 asyncio 루프 사용
+    uvloop = None
+
 # ===== ENV =====
 API_ID = int(os.getenv("API_ID"))
 API_HASH = os.getenv("API_HASH")
@@ -20,7 +34,8 @@ CHANNELS = os.getenv(
 
 OUTPUT_DIR = os.getenv("OUTPUT_DIR", "exports")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
-LATEST_PATH = os.path.join(OUTPUT_DIR, "latest.json")
+LATEST_PATH = os.path.join(OUTPUT_DIR, "latest.jsonl")    # NDJSON, 오래된순으로 계속 이어 붙임
+LEGACY_LATEST_PATH = os.path.join(OUTPUT_DIR, "latest.json")   # 예전 JSON 배열 형식, latest.jsonl로 한 번 옮긴 뒤 삭제
 CP_PATH = os.path.join(OUTPUT_DIR, "checkpoints.json")   # 채널별 last_id 저장
 
 # ---- 자동 폴링 설정 (추가) ----
@@ -28,8 +43,12 @@ ENABLE_AUTO_POLL = os.getenv("ENABLE_AUTO_POLL", "false").lower() == "true"
 POLL_INTERVAL_SEC = int(os.getenv("POLL_INTERVAL_SEC", "300"))  # 기본 5분
 AUTO_SINCE_HOURS = int(os.getenv("AUTO_SINCE_HOURS", "24"))
 PER_CHANNEL_LIMIT = int(os.getenv("PER_CHANNEL_LIMIT", "500"))
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "4"))  # 동시에 수집할 채널 수
+LATEST_COMPACT_SEC = int(os.getenv("LATEST_COMPACT_SEC", "3600"))  # latest.jsonl 정리 주기 (기본 1시간)
+MAX_SINCE_HOURS = 168   # API로 조회 가능한 최대 구간 = latest.jsonl 보관 구간
 
-client = TelegramClient(StringSession(SESSION_STR), API_ID, API_HASH)
+# flood_sleep_threshold=0: 짧은 FloodWait도 Telethon 내부에서 자지 않고 예외로 올려 _flood_gate가 처리
+client = TelegramClient(StringSession(SESSION_STR), API_ID, API_HASH, flood_sleep_threshold=0)
 app = FastAPI(title="Telegram Collector API")
 
 # ===== models =====
@@ -42,88 +61,286 @@ class MsgQuery(BaseModel):
     reactions: Optional[dict]
     reply_count: Optional[int]
     date: str
+    ts: int          # date의 epoch 초 (필터링 시 ISO 파싱 생략용)
     url: str
 
+@dataclasses.dataclass(slots=True)
+class MsgRecord:
+    """수집 루프에서 만드는 레코드 (MsgQuery와 같은 필드). dict보다 가볍고 orjson이 그대로 직렬화."""
+    channel: str
+    id: int
+    text: Optional[str]
+    views: Optional[int]
+    forwards: Optional[int]
+    reactions: Optional[dict]
+    reply_count: Optional[int]
+    date: str
+    ts: int
+    url: str
+
+def _rec_ts(m: dict) -> float:
+    """레코드의 epoch 초. ts 필드가 없는 예전 latest.json 레코드(옮겨 올 때)는 date 문자열을 파싱."""
+    ts = m.get("ts")
+    if ts is None:
+        ts = datetime.fromisoformat(m["date"].replace("Z", "+00:00")).timestamp()
+    return ts
+
+# ===== json helpers =====
+def _json_default(o):
+    # 표준 json 대체 경로용 (orjson은 dataclass/datetime을 직접 처리)
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    if isinstance(o, datetime):
+        return o.isoformat()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+def _dumps(obj, indent: bool = False) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None, default=_json_default).encode("utf-8")
+
+def _loads(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
 # ===== checkpoints =====
-def load_cp() -> Dict[str, int]:
+async def load_cp() -> Dict[str, int]:
     if os.path.exists(CP_PATH):
-        with open(CP_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
+        async with aiofiles.open(CP_PATH, "rb") as f:
+            return _loads(await f.read())
     return {}
 
-def save_cp(cp: Dict[str, int]) -> None:
-    with open(CP_PATH, "w", encoding="utf-8") as f:
-        json.dump(cp, f, ensure_ascii=False, indent=2)
+_cp_tmp_seq = itertools.count()
 
-# ===== collectors =====
-async def fetch_channel_messages(channel: str, since_dt: datetime, limit: int, min_id: Optional[int]) -> List[dict]:
-    out = []
+async def save_cp(cp: Dict[str, int]) -> None:
+    # 임시 파일에 쓴 뒤 교체 -> 중간에 죽어도 checkpoints.json이 깨지지 않음 (부트스트랩 오판 방지)
+    # 호출마다 고유한 임시 파일을 써서 겹치는 저장끼리 같은 파일을 비우거나 덮어쓰지 않도록 함
+    # (일반 open으로 만들어 umask 기본 권한 유지 - mkstemp의 0600이 checkpoints.json에 옮겨가지 않도록)
+    tmp = f"{CP_PATH}.{os.getpid()}.{next(_cp_tmp_seq)}.tmp"
     try:
-        entity = await client.get_entity(channel)
-    except Exception as e:
-        print(f"[WARN] get_entity {channel}: {e}")
-        return out
+        async with aiofiles.open(tmp, "wb") as f:
+            await f.write(_dumps(cp, indent=True))
+        os.replace(tmp, CP_PATH)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+# ===== collectors =====
+# 채널 username -> InputPeer 캐시 (폴링마다 resolveUsername 호출하지 않도록)
+_entity_cache: Dict[str, object] = {}
+
+# FloodWait가 나면 모든 채널 수집을 함께 멈추는 게이트 (set 상태 = 진행 가능)
+# client를 flood_sleep_threshold=0으로 만들어 길이와 상관없이 모든 FloodWaitError가 여기로 옴
+_flood_gate = asyncio.Event()
+_flood_gate.set()
+_flood_until = 0.0    # 게이트를 다시 열 시각 (time.monotonic)
+_last_flood = 0.0     # 마지막 FloodWait 시각
+_flood_strikes = 0    # FLOOD_RESET_SEC 안에 반복된 FloodWait 이벤트 수 -> 대기 시간 2배씩 (최대 8배)
+FLOOD_RESET_SEC = 3600
 
+async def _flood_pause(seconds: int, channel: str) -> None:
+    global _flood_until, _last_flood, _flood_strikes
+    now = time.monotonic()
+    if now >= _flood_until:
+        # 새 FloodWait 이벤트: 직전 이벤트 후 FLOOD_RESET_SEC 안이면 백오프 배수 증가
+        _flood_strikes = _flood_strikes + 1 if _last_flood and now - _last_flood < FLOOD_RESET_SEC else 0
+        _last_flood = now
+        wait = (seconds + 1) * min(2 ** _flood_strikes, 8)
+        _flood_until = now + wait
+        print(f"[RATE] Flood wait {seconds}s {channel} -> pausing all fetches {wait}s (strike {_flood_strikes})")
+    else:
+        # 이미 멈춘 동안 들어온 FloodWait(같은 burst의 동시 요청)는 백오프 없이 대기 시각만 늘림
+        _flood_until = max(_flood_until, now + seconds + 1)
+        print(f"[RATE] Flood wait {seconds}s {channel} during active pause")
+    _flood_gate.clear()
     try:
-        # min_id가 있으면 그 이후만(증분). 없으면 since_dt 기준(부트스트랩).
-        async for msg in client.iter_messages(entity, limit=None, min_id=min_id):
-            if msg.date is None:
-                continue
-            if min_id is None and msg.date.replace(tzinfo=None) < since_dt.replace(tzinfo=None):
-                break
-            rec = {
-                "channel": channel,
-                "id": msg.id,
-                "text": getattr(msg, "message", None) or getattr(msg, "text", None),
-                "views": getattr(msg, "views", None),
-                "forwards": getattr(msg, "forwards", None),
-                "reactions": (msg.reactions.to_dict() if getattr(msg, "reactions", None) else None),
-                "reply_count": getattr(getattr(msg, "replies", None), "comments", None),
-                "date": msg.date.isoformat(),
-                "url": f"https://t.me/{channel}/{msg.id}",
-            }
-            out.append(rec)
-            if limit and len(out) >= limit:
-                break
-        await asyncio.sleep(1)
-    except FloodWaitError as fw:
-        print(f"[RATE] Flood wait {fw.seconds}s {channel}")
-        await asyncio.sleep(fw.seconds + 1)
-    except Exception as e:
-        print(f"[ERR] iter_messages {channel}: {e}")
-    return out
+        # 다른 채널이 대기 시간을 늘렸으면 그 시각까지 함께 기다림
+        while (remaining := _flood_until - time.monotonic()) > 0:
+            await asyncio.sleep(remaining)
+    finally:
+        _flood_gate.set()
+
+def _build_rec(msg, channel: str, msg_id: int, msg_ts: float, url_prefix: str) -> MsgRecord:
+    """Telethon 메시지 -> MsgRecord. 수집 루프에서 메시지마다 호출되는 유일한 순수 계산 부분."""
+    # MessageService 등에는 없는 속성이 있어 getattr 유지
+    reactions = getattr(msg, "reactions", None)
+    replies = getattr(msg, "replies", None)
+    return MsgRecord(
+        channel=channel,
+        id=msg_id,
+        text=getattr(msg, "message", None) or getattr(msg, "text", None),
+        views=getattr(msg, "views", None),
+        forwards=getattr(msg, "forwards", None),
+        reactions=reactions.to_dict() if reactions else None,
+        reply_count=replies.comments if replies else None,
+        date=msg.date.isoformat(),
+        ts=int(msg_ts),
+        url=url_prefix + str(msg_id),
+    )
+
+async def fetch_channel_messages(channel: str, since_dt: datetime, limit: int, min_id: Optional[int],
+                                 sem: asyncio.Semaphore) -> Tuple[List[MsgRecord], int]:
+    """채널 메시지와 그중 가장 큰 message id를 함께 반환 (수집 결과가 없거나 중간에 끊기면 0)."""
+    async with sem:
+        return await _fetch_channel_messages(channel, since_dt, limit, min_id)
+
+async def _fetch_channel_messages(channel: str, since_dt: datetime, limit: int,
+                                  min_id: Optional[int]) -> Tuple[List[MsgRecord], int]:
+    out = []
+    max_id = 0
+    await _flood_gate.wait()
+    entity = _entity_cache.get(channel)
+    if entity is None:
+        try:
+            entity = await client.get_input_entity(channel)
+        except FloodWaitError as fw:
+            # 캐시가 빈 첫 수집에서는 모든 채널이 동시에 resolveUsername -> 여기서도 전체를 멈춤
+            await _flood_pause(fw.seconds, channel)
+            return out, max_id
+        except Exception as e:
+            print(f"[WARN] get_input_entity {channel}: {e}")
+            return out, max_id
+        _entity_cache[channel] = entity
+
+    since_ts = since_dt.timestamp()
+    url_prefix = f"https://t.me/{channel}/"
+    offset_id = 0        # 마지막으로 받은 id. FloodWait 대기 후 여기서부터 이어서 받음 (최신순이라 더 오래된 쪽)
+    complete = False
+    while not complete:
+        try:
+            # min_id가 있으면 그 이후만(증분). 없으면 since_dt 기준(부트스트랩).
+            # limit을 넘겨야 마지막 페이지 크기를 맞춰 요청하고, wait_time=0: 페이지 사이 대기는 flood gate가 담당
+            remaining = limit - len(out) if limit else None
+            async for msg in client.iter_messages(entity, limit=remaining, min_id=min_id,
+                                                  offset_id=offset_id, wait_time=0):
+                if not _flood_gate.is_set():   # 다른 채널이 FloodWait 중이면 다음 페이지 요청 전에 대기
+                    await _flood_gate.wait()
+                msg_id = msg.id
+                offset_id = msg_id
+                if msg.date is None:
+                    continue
+                msg_ts = msg.date.timestamp()
+                if min_id is None and msg_ts < since_ts:
+                    break
+                if msg_id > max_id:
+                    max_id = msg_id
+                out.append(_build_rec(msg, channel, msg_id, msg_ts, url_prefix))
+            complete = True
+        except FloodWaitError as fw:
+            await _flood_pause(fw.seconds, channel)   # 전체 대기 후 offset_id부터 다시 시도
+        except (ChannelPrivateError, UsernameNotOccupiedError) as e:
+            # 채널이 비공개로 바뀌었거나 username이 바뀐 경우 다음 수집 때 다시 조회
+            _entity_cache.pop(channel, None)
+            print(f"[WARN] {channel} unavailable, entity cache cleared: {e}")
+            break
+        except Exception as e:
+            print(f"[ERR] iter_messages {channel}: {e}")
+            break
+    if not complete:
+        # 중간에 끊긴 채널은 체크포인트를 올리지 않음 (못 받은 오래된 메시지를 다음 수집에서 다시 받도록)
+        max_id = 0
+    return out, max_id
+
+def _start_eager(coro) -> asyncio.Future:
+    """Python 3.12+ 이면 이 태스크만 eager로 시작 (첫 await 전까지 바로 실행).
+    루프 전역 eager_task_factory는 쓰지 않음: Telethon의 send/recv 루프가 연결 완료 전에 실행돼 바로 종료됨."""
+    if sys.version_info >= (3, 12):
+        return asyncio.Task(coro, loop=asyncio.get_running_loop(), eager_start=True)
+    return asyncio.ensure_future(coro)
+
+_ZSTD = zstandard.ZstdCompressor(level=3)
 
 async def collect_all(channels: List[str], since_hours: int = 24, per_channel_limit: int = 500):
-    since_dt = datetime.utcnow() - timedelta(hours=since_hours)
-    cp = load_cp()                         # {"channel": last_id}
+    # 같은 채널이 중복 지정되면 동시에 두 번 수집하게 되므로 미리 제거 (순서 유지)
+    channels = list(dict.fromkeys(channels))
+    # 연결은 프로세스 수명 동안 유지하지만, Telethon 자동 재연결이 포기한 경우 여기서 다시 연결
+    if not client.is_connected():
+        print("[INFO] telegram client disconnected, reconnecting")
+        await client.connect()
+    since_dt = datetime.now(timezone.utc) - timedelta(hours=since_hours)
+    cp = await load_cp()                   # {"channel": last_id}
     new_cp = dict(cp)
-    results = []
+    fetched = []
 
     mode = "incremental" if cp else "bootstrap"
     print(f"[MODE] {mode} collection (since_hours={since_hours})")
 
-    async with client:
-        for ch in channels:
-            last_id = cp.get(ch) if cp else None
-            print(f"[INFO] Fetching {ch} ({'inc' if last_id else 'boot'}) since {since_dt.isoformat()} last_id={last_id}")
-            msgs = await fetch_channel_messages(ch, since_dt, per_channel_limit, min_id=last_id)
-            print(f"[INFO] {ch} -> {len(msgs)}")
-            results.extend(msgs)
-            if msgs:
-                new_cp[ch] = max(m["id"] for m in msgs)
-
-    # dedupe + save
-    final = list({f"{r['channel']}:{r['id']}": r for r in results}.values())
+    # 채널별 수집을 동시에 실행 (세마포어로 동시 요청 수 제한)
+    # client 연결은 서버 시작 시(_on_startup) 또는 --collect-once(_collect_once)에서 맺고, 끊겼을 때만 위에서 재연결
+    sem = asyncio.Semaphore(FETCH_CONCURRENCY)
+    for ch in channels:
+        last_id = cp.get(ch) if cp else None
+        print(f"[INFO] Fetching {ch} ({'inc' if last_id else 'boot'}) since {since_dt.isoformat()} last_id={last_id}")
+    msgs_list = await asyncio.gather(
+        *[_start_eager(fetch_channel_messages(ch, since_dt, per_channel_limit, cp.get(ch), sem)) for ch in channels],
+        return_exceptions=True,
+    )
+
+    for ch, res in zip(channels, msgs_list):
+        if isinstance(res, BaseException):
+            print(f"[ERR] fetch {ch}: {res}")
+            continue
+        msgs, mx = res
+        print(f"[INFO] {ch} -> {len(msgs)}")
+        fetched.append(msgs)
+        if mx:
+            new_cp[ch] = mx
+
+    # dedupe + save: 레코드 단위로 바로 파일에 기록 (전체 리스트/문자열을 메모리에 만들지 않음)
+    # 채널 목록이 이미 중복 제거돼 있어 seen 은 (channel, id) 튜플만 담는 안전장치 역할
     run_ts = datetime.utcnow().strftime("%Y%m%d_%H%M%SZ")
-    outfile = os.path.join(OUTPUT_DIR, f"telegram_messages_{run_ts}.json")
-    with open(outfile, "w", encoding="utf-8") as f:
-        json.dump(final, f, ensure_ascii=False, indent=2)
-    with open(LATEST_PATH, "w", encoding="utf-8") as f:
-        json.dump(final, f, ensure_ascii=False, indent=2)
-    save_cp(new_cp)
+    # 회차별 export는 다시 읽을 일이 드물어 zstd로 압축해 보관 (latest.jsonl은 API가 읽으므로 비압축)
+    outfile = os.path.join(OUTPUT_DIR, f"telegram_messages_{run_ts}.json.zst")
+    seen: Set[Tuple[str, int]] = set()
+    # 압축(compaction) 도중 다른 수집이 이어 붙인 줄이 os.replace로 사라지지 않도록 잠금
+    async with _latest_lock:
+        await _import_legacy_latest()
+        with open(outfile, "wb") as raw_f, _ZSTD.stream_writer(raw_f) as out_f, open(LATEST_PATH, "ab") as latest_f:
+            out_f.write(b"[")
+            # 채널별 리스트(최신순)를 뒤집어 병합 -> 오래된순. latest.jsonl 뒤에 이번 수집분만 이어 붙임
+            for rec in heapq.merge(*(reversed(m) for m in fetched), key=lambda r: r.ts):
+                key = (rec.channel, rec.id)
+                if key in seen:
+                    continue
+                data = _dumps(rec)
+                out_f.write((b",\n" if seen else b"\n") + data)
+                latest_f.write(data + b"\n")
+                seen.add(key)
+            out_f.write(b"\n]\n")
+        await _maybe_compact_latest()
+    app.state.latest = None               # get_messages 캐시 무효화
+    _render_messages.cache_clear()
+    if new_cp != cp:
+        await save_cp(new_cp)
+
+    print(f"[INFO] Saved {len(seen)} -> {outfile}")
+    return {"path": outfile, "count": len(seen), "mode": mode}
 
-    print(f"[INFO] Saved {len(final)} -> {outfile}")
-    return {"path": outfile, "count": len(final), "mode": mode}
+# 폴러와 refresh 요청은 진행 중인 수집 하나를 함께 기다림 (동시 수집/중복 스크랩/FloodWait 방지)
+_collect_lock = asyncio.Lock()
+_collect_task: Optional[asyncio.Task] = None
+_collect_args: Tuple[int, int] = (0, 0)   # 진행 중인 수집의 (since_hours, per_channel_limit)
+
+def _covers(running: Tuple[int, int], since_hours: int, per_channel_limit: int) -> bool:
+    """진행 중인 수집이 요청한 구간/개수를 모두 포함하는지 (per_channel_limit 0 = 무제한)."""
+    run_hours, run_limit = running
+    limit_ok = run_limit == 0 or (per_channel_limit != 0 and run_limit >= per_channel_limit)
+    return run_hours >= since_hours and limit_ok
+
+async def _collect_single_flight(since_hours: int, per_channel_limit: int = 500):
+    global _collect_task, _collect_args
+    while True:
+        async with _collect_lock:
+            if _collect_task is None or _collect_task.done():
+                _collect_task = asyncio.create_task(collect_all(CHANNELS, since_hours, per_channel_limit))
+                _collect_args = (since_hours, per_channel_limit)
+            covered = _covers(_collect_args, since_hours, per_channel_limit)
+            task = _collect_task
+        # 기다리던 쪽 하나가 취소돼도 공유 중인 수집이 취소되지 않도록 shield
+        result = await asyncio.shield(task)
+        if covered:
+            return result
+        # 진행 중이던 수집이 더 좁은 구간/개수였으면 끝난 뒤 요청한 조건으로 다시 수집
 
 # ===== background poller (추가) =====
 _poller_task = None
@@ -131,16 +348,33 @@ _poller_task = None
 async def _poller_loop():
     """주기적으로 수집을 실행하는 폴링 루프 (자동 폴링 켜진 경우에만)."""
     print(f"[POLL] auto polling enabled: interval={POLL_INTERVAL_SEC}s, since_hours={AUTO_SINCE_HOURS}, per_channel_limit={PER_CHANNEL_LIMIT}")
+    # 수집 소요 시간과 상관없이 일정한 주기를 유지하도록 monotonic 기준 다음 시각을 계산
+    loop = asyncio.get_running_loop()
+    next_t = loop.time()
     while True:
         try:
-            await collect_all(CHANNELS, since_hours=AUTO_SINCE_HOURS, per_channel_limit=PER_CHANNEL_LIMIT)
+            await _collect_single_flight(AUTO_SINCE_HOURS, PER_CHANNEL_LIMIT)
         except Exception as e:
             print(f"[POLL][ERR] collect_all failed: {e}")
-        await asyncio.sleep(POLL_INTERVAL_SEC)
+        next_t += POLL_INTERVAL_SEC
+        delay = next_t - loop.time()
+        if delay < 0:
+            # 수집이 주기보다 오래 걸림 -> 밀린 회차를 몰아서 돌리지 않고 지금부터 다시 한 주기
+            print(f"[POLL][WARN] collect overran interval by {-delay:.1f}s")
+            next_t = loop.time() + POLL_INTERVAL_SEC
+            delay = POLL_INTERVAL_SEC
+        await asyncio.sleep(delay)
 
 @app.on_event("startup")
 async def _on_startup():
     global _poller_task
+    # 프로세스 수명 동안 연결 유지 (수집마다 MTProto 핸드셰이크 반복하지 않도록)
+    await client.connect()
+    if not await client.is_user_authorized():
+        raise RuntimeError("Telegram session is not authorized (check TELETHON_STRING_SESSION)")
+    print("[INFO] telegram client connected")
+    async with _latest_lock:
+        await _import_legacy_latest()
     if ENABLE_AUTO_POLL:
         # 백그라운드 태스크 시작
         loop = asyncio.get_event_loop()
@@ -156,38 +390,126 @@ async def _on_shutdown():
         _poller_task.cancel()
         _poller_task = None
         print("[POLL] background poller stopped")
+    # 연결을 끊기 전에 진행 중인 수집을 정리 (shield 때문에 폴러 취소만으로는 멈추지 않음)
+    if _collect_task is not None and not _collect_task.done():
+        _collect_task.cancel()
+        try:
+            await _collect_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        print("[INFO] in-flight collect cancelled")
+    await client.disconnect()
+
+# ===== latest.jsonl =====
+_latest_lock = asyncio.Lock()   # latest.jsonl 이어 쓰기/압축 직렬화
+_last_compact = 0.0   # time.monotonic() 기준, 0이면 프로세스 시작 후 첫 수집에서 정리
+
+async def _import_legacy_latest() -> None:
+    """예전 latest.json(JSON 배열)을 latest.jsonl로 한 번 옮기고 삭제. latest.jsonl이 이미 있으면 아무것도 안 함."""
+    if os.path.exists(LATEST_PATH) or not os.path.exists(LEGACY_LATEST_PATH):
+        return
+    try:
+        async with aiofiles.open(LEGACY_LATEST_PATH, "rb") as f:
+            raw = _loads(await f.read())
+        recs = []
+        for m in raw:
+            try:
+                m["ts"] = int(_rec_ts(m))
+            except Exception:
+                continue
+            recs.append(m)
+        recs.sort(key=lambda m: m["ts"])
+        tmp = LATEST_PATH + ".tmp"
+        async with aiofiles.open(tmp, "wb") as f:
+            await f.write(b"".join(_dumps(m) + b"\n" for m in recs))
+        os.replace(tmp, LATEST_PATH)
+    except Exception as e:
+        print(f"[WARN] could not import {os.path.basename(LEGACY_LATEST_PATH)}: {e}")
+        return
+    os.unlink(LEGACY_LATEST_PATH)
+    print(f"[INFO] imported {len(recs)} records from {os.path.basename(LEGACY_LATEST_PATH)} into {os.path.basename(LATEST_PATH)}")
+
+async def _read_latest() -> List[Tuple[float, dict]]:
+    """latest.jsonl을 (ts, 레코드) 오래된순 리스트로 읽음. 깨진 줄(쓰는 중인 마지막 줄 등)과 중복은 건너뜀."""
+    async with aiofiles.open(LATEST_PATH, "rb") as f:
+        raw = await f.read()
+    pairs = []
+    seen: Set[Tuple[str, int]] = set()
+    for line in raw.splitlines():
+        try:
+            m = _loads(line)
+            key = (m["channel"], m["id"])
+            ts = _rec_ts(m)
+        except Exception:
+            continue
+        if key in seen:
+            continue
+        seen.add(key)
+        pairs.append((ts, m))
+    pairs.sort(key=lambda p: p[0])   # 이어 붙인 파일은 거의 정렬돼 있어 O(N)에 가까움
+    return pairs
+
+async def _maybe_compact_latest() -> None:
+    """LATEST_COMPACT_SEC마다 latest.jsonl을 MAX_SINCE_HOURS 이내 레코드만 남겨 다시 씀."""
+    global _last_compact
+    now = time.monotonic()
+    if _last_compact and now - _last_compact < LATEST_COMPACT_SEC:
+        return
+    _last_compact = now
+    cutoff_ts = time.time() - MAX_SINCE_HOURS * 3600
+    pairs = await _read_latest()
+    tmp = LATEST_PATH + ".tmp"
+    async with aiofiles.open(tmp, "wb") as f:
+        await f.write(b"".join(_dumps(m) + b"\n" for ts, m in pairs if ts >= cutoff_ts))
+    os.replace(tmp, LATEST_PATH)
+    print(f"[INFO] compacted {os.path.basename(LATEST_PATH)}")
+
+app.state.latest = None   # (mtime_ns, data, ts) - data와 ts 모두 오래된순
+
+async def _load_latest() -> Tuple[int, List[dict], "array[float]"]:
+    """latest.jsonl을 읽어 mtime 기준으로 캐시. 같은 파일이면 다시 파싱하지 않음."""
+    mtime = os.stat(LATEST_PATH).st_mtime_ns
+    cached = app.state.latest
+    if cached is not None and cached[0] == mtime:
+        return cached
+
+    pairs = await _read_latest()
+    data = [m for _, m in pairs]
+    ts = array("d", [t for t, _ in pairs])   # float 객체 대신 연속된 C double 배열 (bisect 그대로 사용)
+    app.state.latest = (mtime, data, ts)
+    return app.state.latest
+
+@functools.lru_cache(maxsize=8)
+def _render_messages(mtime: int, start: int) -> bytes:
+    """app.state.latest의 start 이후 구간을 응답 JSON으로 직렬화.
+    같은 파일(mtime)에서 같은 구간이면 폴링 주기 동안 직렬화 결과를 재사용."""
+    data = app.state.latest[1]
+    filtered = data[start:][::-1]   # 최신순
+    return _dumps({"source": os.path.basename(LATEST_PATH), "messages": filtered, "count": len(filtered)})
 
 # ===== API =====
 @app.get("/telegram/messages")
-async def get_messages(since_hours: int = Query(24, ge=1, le=168), refresh: bool = Query(False)):
+async def get_messages(since_hours: int = Query(24, ge=1, le=MAX_SINCE_HOURS), refresh: bool = Query(False)):
     if refresh:
-        await collect_all(CHANNELS, since_hours)
+        await _collect_single_flight(since_hours)
 
     if not os.path.exists(LATEST_PATH):
         return {"messages": [], "count": 0, "note": "no data collected"}
 
-    with open(LATEST_PATH, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    cutoff = datetime.utcnow() - timedelta(hours=since_hours)
-    filtered = []
-    for m in data:
-        try:
-            t = datetime.fromisoformat(m["date"].replace("Z", "+00:00")).replace(tzinfo=None)
-            if t >= cutoff:
-                filtered.append(m)
-        except Exception:
-            continue
-    return {"source": os.path.basename(LATEST_PATH), "messages": filtered, "count": len(filtered)}
+    mtime, _, ts = await _load_latest()
+    cutoff_ts = time.time() - since_hours * 3600
+    start = bisect_left(ts, cutoff_ts)   # ts >= cutoff_ts 인 구간의 시작
+    # 캐시 키가 (파일, 구간 시작)이라 since_hours가 달라도 결과가 같으면 공유하고, 오래된 결과는 남지 않음
+    return Response(content=_render_messages(mtime, start), media_type="application/json")
 
 @app.get("/telegram/files")
 def list_files():
-    files = sorted([f for f in os.listdir(OUTPUT_DIR) if f.endswith(".json")])
+    files = sorted([f for f in os.listdir(OUTPUT_DIR) if f.endswith((".json", ".json.zst"))])
     return {"files": files}
 
 @app.get("/telegram/checkpoints")
-def get_checkpoints():
-    return load_cp()
+async def get_checkpoints():
+    return await load_cp()
 
 # 편의용 헬스/설정 확인 (추가)
 @app.get("/health")
@@ -201,10 +523,23 @@ def config():
         "POLL_INTERVAL_SEC": POLL_INTERVAL_SEC,
         "AUTO_SINCE_HOURS": AUTO_SINCE_HOURS,
         "PER_CHANNEL_LIMIT": PER_CHANNEL_LIMIT,
+        "FETCH_CONCURRENCY": FETCH_CONCURRENCY,
+        "LATEST_COMPACT_SEC": LATEST_COMPACT_SEC,
         "CHANNELS": CHANNELS,
     }
 
 # ===== main =====
+def _run(coro):
+    """uvloop이 있으면 uvloop 이벤트 루프 위에서 코루틴을 실행."""
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return asyncio.run(coro)
+
+async def _collect_once(since_hours: int, per_channel_limit: int):
+    """서버 없이 한 번만 수집 (연결 -> 수집 -> 종료)."""
+    async with client:
+        return await collect_all(CHANNELS, since_hours, per_channel_limit=per_channel_limit)
+
 if __name__ == "__main__":
     import uvicorn, argparse
     parser = argparse.ArgumentParser()
@@ -215,14 +550,11 @@ if __name__ == "__main__":
     parser.add_argument("--per-channel-limit", type=int, default=PER_CHANNEL_LIMIT)
     args = parser.parse_args()
 
+    loop_impl = "uvloop" if uvloop is not None else "asyncio"
     if args.collect_once and not args.serve:
-        asyncio.get_event_loop().run_until_complete(
-            collect_all(CHANNELS, args.since_hours, per_channel_limit=args.per_channel_limit)
-        )
+        _run(_collect_once(args.since_hours, args.per_channel_limit))
     elif args.serve and not args.collect_once:
-        uvicorn.run("telegram_service:app", host="0.0.0.0", port=args.port)
+        uvicorn.run("telegram_service:app", host="0.0.0.0", port=args.port, loop=loop_impl)
     else:
-        asyncio.get_event_loop().run_until_complete(
-            collect_all(CHANNELS, args.since_hours, per_channel_limit=args.per_channel_limit)
-        )
-        uvicorn.run("telegram_service:app", host="0.0.0.0", port=args.port)
+        _run(_collect_once(args.since_hours, args.per_channel_limit))
+        uvicorn.run("telegram_service:app", host="0.0.0.0", port=args.port, loop=loop_impl)